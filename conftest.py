@@ -0,0 +1,63 @@
+"""Shared pytest fixtures: a stub standing in for the upstream APIs."""
+import threading
+import time
+
+import pytest
+import requests
+
+from mcp_common import resilience
+
+# These are manual scripts that call the live APIs, not tests
+collect_ignore = ["regulations_mcp/test_server.py", "weather_mcp/test_server.py"]
+
+class StubResponse:
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self.payload = payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"HTTP {self.status_code}", response=self)
+
+    def json(self):
+        return self.payload
+
+class StubUpstream:
+    """
+    Replaces requests.get, counting calls and failing or stalling on demand.
+
+    payload is either the JSON returned for every URL or a function of the URL.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.down = False
+        self.delay = 0
+        self.status_code = 200
+        self.payload = {"data": ["stub"]}
+        self.lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if self.down:
+            raise requests.exceptions.ConnectionError("stub upstream is down")
+        payload = self.payload(url) if callable(self.payload) else self.payload
+        return StubResponse(self.status_code, payload)
+
+    def wait_for_background_refreshes(self):
+        """Wait until no fetch holds a lease, i.e. background refreshes have finished."""
+        deadline = time.monotonic() + 5
+        while resilience.try_state(resilience.state.execute, "SELECT 1 FROM leases") and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """A stub upstream and an empty in-memory state store."""
+    stub = StubUpstream()
+    monkeypatch.setattr(resilience.requests, "get", stub.get)
+    monkeypatch.setattr(resilience, "state", resilience.StateStore(":memory:"))
+    yield stub
+    # Keep refreshes started by this test from reaching the next test's stub
+    stub.wait_for_background_refreshes()
@@ -0,0 +1,197 @@
+"""
+Load test for the HTTP serving mode of the MCP servers.
+
+Starts a local stub of regulations.gov and WeatherAPI.com that answers every request
+after a fixed delay, then runs a server over streamable HTTP with an increasing number
+of worker processes and measures tool-call throughput against it. Every call uses a
+unique query so the cache never answers for the upstream. Each worker overlaps the
+upstream waits of concurrent calls, so throughput scales with workers up to the number
+of CPU cores.
+
+Example:
+    python load_test.py --server regulations --workers 1 2 4
+"""
+import argparse
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Canned upstream responses, shaped like the real APIs
+REGULATIONS_RESPONSE = {
+    "data": [
+        {
+            "id": "EPA-HQ-OAR-2024-0001-0001",
+            "attributes": {
+                "title": "Stub document",
+                "documentType": "Rule",
+                "postedDate": "2024-01-01",
+                "docketId": "EPA-HQ-OAR-2024-0001",
+            },
+        }
+    ]
+}
+WEATHER_RESPONSE = {
+    "location": {"name": "Stubville", "country": "Nowhere"},
+    "forecast": {
+        "forecastday": [
+            {
+                "date": "2024-01-01",
+                "day": {
+                    "condition": {"text": "Sunny"},
+                    "maxtemp_c": 20.0,
+                    "mintemp_c": 10.0,
+                    "maxtemp_f": 68.0,
+                    "mintemp_f": 50.0,
+                },
+            }
+        ]
+    },
+}
+
+# How each server is launched and which tool call is used to load it
+SERVERS = {
+    "regulations": {
+        "script": os.path.join(ROOT, "regulations_mcp", "server.py"),
+        "base_url_env": "REGULATIONS_GOV_BASE_URL",
+        "tool": "search_documents",
+        "arguments": lambda i: {"search_term": f"load test {i}", "limit": 5},
+    },
+    "weather": {
+        "script": os.path.join(ROOT, "weather_mcp", "server.py"),
+        "base_url_env": "WEATHER_API_BASE_URL",
+        "tool": "get_forecast",
+        "arguments": lambda i: {"location": f"Stubville {i}", "days": 1},
+    },
+}
+
+def start_stub_upstream(latency):
+    """Start the stub upstream on a free port and return the server."""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latency)
+            payload = WEATHER_RESPONSE if "forecast.json" in self.path else REGULATIONS_RESPONSE
+            body = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    stub = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    stub.daemon_threads = True
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    return stub
+
+def call_tool(session, url, name, arguments, request_id):
+    """Call a tool over the streamable HTTP transport and return the text it produced."""
+    response = session.post(
+        url,
+        headers={"Accept": "application/json, text/event-stream", "Content-Type": "application/json"},
+        json={
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "method": "tools/call",
+            "params": {"name": name, "arguments": arguments},
+        },
+        timeout=30,
+    )
+    response.raise_for_status()
+    result = response.json()["result"]
+    return result["content"][0]["text"]
+
+def wait_until_ready(url, timeout=30):
+    """Wait for the server to accept connections."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.exceptions.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start within {timeout} seconds")
+
+def run_round(config, workers, port, upstream_url, calls, concurrency):
+    """Run one server configuration and return its throughput in calls per second."""
+    state_dir = tempfile.mkdtemp(prefix="mcp_load_test_")
+    env = dict(
+        os.environ,
+        **{config["base_url_env"]: upstream_url},
+        STATE_DB=os.path.join(state_dir, "state.sqlite3"),
+    )
+    server = subprocess.Popen(
+        [sys.executable, config["script"], "--transport", "streamable-http", "--port", str(port), "--workers", str(workers)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}/mcp"
+
+    try:
+        wait_until_ready(url)
+        session = requests.Session()
+        session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+
+        # Warm up every worker before measuring
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(lambda i: call_tool(session, url, config["tool"], config["arguments"](f"warmup {i}"), i), range(concurrency)))
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(lambda i: call_tool(session, url, config["tool"], config["arguments"](i), i), range(calls)))
+        elapsed = time.monotonic() - started
+    finally:
+        # SIGTERM exercises graceful draining
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+    errors = [text for text in results if text.startswith("Error")]
+    if errors:
+        raise RuntimeError(f"{len(errors)} tool calls failed, e.g.: {errors[0]}")
+    return calls / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure MCP server throughput against a local stub upstream.")
+    parser.add_argument("--server", choices=sorted(SERVERS), default="regulations", help="Server to load test")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to compare")
+    parser.add_argument("--calls", type=int, default=200, help="Tool calls per worker count")
+    parser.add_argument("--concurrency", type=int, default=64, help="Concurrent client connections")
+    parser.add_argument("--latency", type=float, default=0.1, help="Stub upstream response delay in seconds")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the server under test")
+    args = parser.parse_args()
+
+    stub = start_stub_upstream(args.latency)
+    upstream_url = f"http://127.0.0.1:{stub.server_address[1]}"
+    config = SERVERS[args.server]
+
+    print(f"Load testing the {args.server} server: {args.calls} calls, {args.concurrency} concurrent, {args.latency * 1000:.0f} ms upstream latency\n")
+    print(f"{'Workers':>8} {'Calls/s':>10} {'Speedup':>8}")
+
+    baseline = None
+    for workers in args.workers:
+        throughput = run_round(config, workers, args.port, upstream_url, args.calls, args.concurrency)
+        baseline = baseline or throughput
+        print(f"{workers:>8} {throughput:>10.1f} {throughput / baseline:>7.2f}x")
+
+    stub.shutdown()
+
+if __name__ == "__main__":
+    main()
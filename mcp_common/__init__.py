@@ -0,0 +1 @@
+"""Code shared by the MCP servers in this repository."""
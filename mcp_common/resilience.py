@@ -0,0 +1,328 @@
+"""
+Resilience layer shared by the MCP servers in this repository.
+
+Upstream API calls go through a per-host circuit breaker and rate limit, and GET
+responses are cached with stale-while-revalidate semantics so tools keep answering
+while an upstream is slow or down. All of this state lives in a SQLite database,
+which lets several server processes share it.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import requests
+
+logger = logging.getLogger("mcp_common")
+
+# Resilience settings for upstream outages (all values in seconds unless noted)
+REQUEST_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT_SECONDS", "10"))
+CACHE_FRESH_SECONDS = float(os.getenv("CACHE_FRESH_SECONDS", "300"))
+CACHE_MAX_STALE_SECONDS = float(os.getenv("CACHE_MAX_STALE_SECONDS", "86400"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "256"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "3"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+# Maximum upstream requests per minute for each host (0 means unlimited)
+UPSTREAM_RATE_LIMIT_PER_MINUTE = int(os.getenv("UPSTREAM_RATE_LIMIT_PER_MINUTE", "0"))
+
+# SQLite database holding the cache, circuit breaker, rate-limit and single-flight
+# state. Server processes pointed at the same file share that state; by default it
+# is kept in memory and private to this process.
+STATE_DB = os.getenv("STATE_DB", ":memory:")
+# How long to wait for another process's write to the state database. It is spent
+# holding this process's state lock, so keep it short; when it runs out the tool
+# carries on without the state rather than stalling every other request.
+STATE_BUSY_TIMEOUT = float(os.getenv("STATE_BUSY_TIMEOUT_SECONDS", "0.2"))
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of calling an upstream host whose circuit is open."""
+
+class RateLimitedError(requests.exceptions.RequestException):
+    """Raised instead of calling an upstream host whose per-minute budget is used up."""
+
+class StateStore:
+    """
+    Response cache, circuit breakers, rate limits and in-flight fetch leases kept in SQLite.
+
+    Each update runs in its own immediate transaction, so any number of threads and
+    worker processes can share one database file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = None
+        self.lock = threading.Lock()
+
+    def connection(self):
+        # Connect lazily so worker processes never inherit a connection
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, timeout=STATE_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+            if self.path != ":memory:":
+                self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, data TEXT NOT NULL, stored_at REAL NOT NULL);
+                CREATE TABLE IF NOT EXISTS breakers (host TEXT PRIMARY KEY, failures INTEGER NOT NULL, opened_at REAL, trial_started_at REAL);
+                CREATE TABLE IF NOT EXISTS rate_limits (host TEXT PRIMARY KEY, window INTEGER NOT NULL, count INTEGER NOT NULL);
+                CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, expires_at REAL NOT NULL);
+            """)
+        return self.conn
+
+    def execute(self, sql, params=()):
+        """Run a single statement and return all resulting rows."""
+        with self.lock:
+            return self.connection().execute(sql, params).fetchall()
+
+    @contextmanager
+    def transaction(self):
+        """Run the enclosed statements in one write transaction."""
+        with self.lock:
+            conn = self.connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                # A failed COMMIT (e.g. the database is busy) leaves the transaction open
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+
+    def get_cached(self, key):
+        """Return (data, age_in_seconds) for a cached response, or None."""
+        rows = self.execute("SELECT data, stored_at FROM cache WHERE key = ?", (key,))
+        if not rows:
+            return None
+        data, stored_at = rows[0]
+        return json.loads(data), time.time() - stored_at
+
+    def put_cached(self, key, data):
+        """Cache a response, evicting the oldest entries beyond CACHE_MAX_ENTRIES."""
+        with self.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?)", (key, json.dumps(data), time.time()))
+            conn.execute("DELETE FROM cache WHERE key NOT IN (SELECT key FROM cache ORDER BY stored_at DESC LIMIT ?)", (CACHE_MAX_ENTRIES,))
+
+    def acquire_lease(self, key):
+        """Try to become the only caller fetching key. Leases expire after REQUEST_TIMEOUT."""
+        now = time.time()
+        with self.transaction() as conn:
+            row = conn.execute("SELECT expires_at FROM leases WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[0] > now:
+                return False
+            conn.execute("INSERT OR REPLACE INTO leases VALUES (?, ?)", (key, now + REQUEST_TIMEOUT))
+            return True
+
+    def has_lease(self, key):
+        return bool(self.execute("SELECT 1 FROM leases WHERE key = ? AND expires_at > ?", (key, time.time())))
+
+    def release_lease(self, key):
+        self.execute("DELETE FROM leases WHERE key = ?", (key,))
+
+    def check_circuit(self, host):
+        """
+        Raise CircuitOpenError unless a request to the host may go ahead.
+
+        Returns True if the request is the single trial let through a half-open circuit.
+        """
+        # Avoid taking the write lock while the circuit is closed
+        rows = self.execute("SELECT opened_at FROM breakers WHERE host = ?", (host,))
+        if not rows or rows[0][0] is None:
+            return False
+        now = time.time()
+        with self.transaction() as conn:
+            row = conn.execute("SELECT opened_at, trial_started_at FROM breakers WHERE host = ?", (host,)).fetchone()
+            if row is None or row[0] is None:
+                return False
+            opened_at, trial_started_at = row
+            # After the reset period, let a single trial request through (half-open)
+            trial_running = trial_started_at is not None and now - trial_started_at < REQUEST_TIMEOUT
+            if now - opened_at < BREAKER_RESET_SECONDS or trial_running:
+                raise CircuitOpenError(f"{host} is unavailable (circuit open); not retrying until it recovers")
+            conn.execute("UPDATE breakers SET trial_started_at = ? WHERE host = ?", (now, host))
+            return True
+
+    def cancel_trial(self, host):
+        """Give up a half-open trial that never reached the host, so another caller can make it."""
+        self.execute("UPDATE breakers SET trial_started_at = NULL WHERE host = ?", (host,))
+
+    def record_success(self, host):
+        if not self.execute("SELECT 1 FROM breakers WHERE host = ?", (host,)):
+            return
+        with self.transaction() as conn:
+            row = conn.execute("SELECT opened_at FROM breakers WHERE host = ?", (host,)).fetchone()
+            conn.execute("DELETE FROM breakers WHERE host = ?", (host,))
+        if row is not None and row[0] is not None:
+            logger.info(f"Circuit closed for {host}")
+
+    def record_failure(self, host):
+        with self.transaction() as conn:
+            row = conn.execute("SELECT failures, opened_at FROM breakers WHERE host = ?", (host,)).fetchone()
+            failures = (row[0] if row is not None else 0) + 1
+            was_open = row is not None and row[1] is not None
+            opened_at = time.time() if failures >= BREAKER_FAILURE_THRESHOLD else None
+            conn.execute("INSERT OR REPLACE INTO breakers VALUES (?, ?, ?, NULL)", (host, failures, opened_at))
+        if opened_at is not None and not was_open:
+            logger.warning(f"Circuit opened for {host} after {failures} consecutive failures")
+
+    def take_rate_limit(self, host):
+        """Count a request against the host's per-minute budget, raising RateLimitedError once it is used up."""
+        if UPSTREAM_RATE_LIMIT_PER_MINUTE <= 0:
+            return
+        window = int(time.time() // 60)
+        with self.transaction() as conn:
+            row = conn.execute("SELECT window, count FROM rate_limits WHERE host = ?", (host,)).fetchone()
+            count = row[1] if row is not None and row[0] == window else 0
+            if count >= UPSTREAM_RATE_LIMIT_PER_MINUTE:
+                raise RateLimitedError(f"Rate limit of {UPSTREAM_RATE_LIMIT_PER_MINUTE} requests per minute reached for {host}")
+            conn.execute("INSERT OR REPLACE INTO rate_limits VALUES (?, ?, ?)", (host, window, count + 1))
+
+state = StateStore(STATE_DB)
+
+def is_upstream_failure(e):
+    """Whether an error means the upstream is unhealthy (as opposed to a bad request)."""
+    response = getattr(e, "response", None)
+    if response is None:
+        return True
+    return response.status_code >= 500 or response.status_code == 429
+
+def try_state(action, *args, default=None):
+    """
+    Run a state store operation, returning default if the database is unavailable.
+
+    A locked or broken state database must not fail tool calls, so callers carry on
+    as if the state were empty and call the upstream directly.
+    """
+    try:
+        return action(*args)
+    except sqlite3.Error as e:
+        logger.warning(f"State store unavailable, continuing without it: {str(e)}")
+        return default
+
+def fetch_json(method, url, headers, params, data=None):
+    """Call the upstream through its circuit breaker and rate limit and return the decoded JSON."""
+    host = urlparse(url).netloc
+    trial = try_state(state.check_circuit, host)
+    try:
+        try_state(state.take_rate_limit, host)
+    except RateLimitedError:
+        # The trial never reached the host, so it proves nothing either way
+        if trial:
+            try_state(state.cancel_trial, host)
+        raise
+    try:
+        if method == "GET":
+            response = requests.get(url, headers=headers, params=params, timeout=REQUEST_TIMEOUT)
+        elif method == "POST":
+            response = requests.post(url, headers=headers, params=params, json=data, timeout=REQUEST_TIMEOUT)
+        else:
+            raise ValueError(f"Unsupported HTTP method: {method}")
+        response.raise_for_status()
+        result = response.json()
+    except requests.exceptions.RequestException as e:
+        if is_upstream_failure(e):
+            try_state(state.record_failure, host)
+        else:
+            try_state(state.record_success, host)
+        raise
+    try_state(state.record_success, host)
+    return result
+
+def refresh_in_background(key, url, headers, params):
+    """Re-fetch a cached response on a background thread, unless another caller already is."""
+    if not try_state(state.acquire_lease, key, default=False):
+        return
+
+    def refresh():
+        try:
+            try_state(state.put_cached, key, fetch_json("GET", url, headers, params))
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Background refresh of {url} failed: {str(e)}")
+        finally:
+            try_state(state.release_lease, key)
+
+    threading.Thread(target=refresh, daemon=True).start()
+
+def wait_for_fetch(key):
+    """Wait for another caller's in-flight fetch of key and return the data it cached, or None."""
+    started = time.time()
+    while time.time() - started < REQUEST_TIMEOUT:
+        time.sleep(0.05)
+        cached = try_state(state.get_cached, key)
+        if cached is not None and cached[1] <= time.time() - started:
+            return cached[0]
+        if not try_state(state.has_lease, key, default=False):
+            return None
+    return None
+
+def cached_get(url, headers, params, secret_params=()):
+    """
+    GET a JSON response using stale-while-revalidate caching.
+
+    Fresh cached responses are returned directly. Stale ones up to CACHE_MAX_STALE_SECONDS
+    old are returned immediately while a background refresh runs. Older ones are only used
+    as an offline fallback, with no age limit, when the upstream fails. Concurrent misses
+    for the same request share a single upstream call.
+
+    Args:
+        url: The upstream URL
+        headers: Request headers
+        params: Query parameters
+        secret_params: Names of parameters, such as API keys, that are left out of the
+            cache key so they are never written to the state database
+
+    Returns:
+        A (data, age) tuple, where age is None for fresh data and otherwise the age in
+        seconds of the cached response being served
+    """
+    key_params = {name: value for name, value in params.items() if name not in secret_params}
+    key = f"{url}?{json.dumps(key_params, sort_keys=True)}"
+    cached = try_state(state.get_cached, key)
+    
+    if cached is not None:
+        data, age = cached
+        if age <= CACHE_FRESH_SECONDS:
+            return data, None
+        if age <= CACHE_MAX_STALE_SECONDS:
+            refresh_in_background(key, url, headers, params)
+            return data, age
+    
+    # None means the state store is unavailable, so there is nobody to wait for
+    leased = try_state(state.acquire_lease, key)
+    if leased is False:
+        data = wait_for_fetch(key)
+        if data is not None:
+            return data, None
+    
+    try:
+        data = fetch_json("GET", url, headers, params)
+        try_state(state.put_cached, key, data)
+    except requests.exceptions.RequestException as e:
+        # Offline fallback: any cached copy beats an error, however old it is
+        if cached is not None and is_upstream_failure(e):
+            logger.warning(f"Serving cached response for {url} after upstream error: {str(e)}")
+            return cached
+        raise
+    finally:
+        if leased:
+            try_state(state.release_lease, key)
+    
+    return data, None
+
+def format_age(seconds):
+    """Format an age in seconds as a short human-readable string."""
+    if seconds < 60:
+        return f"{int(seconds)} seconds"
+    if seconds < 3600:
+        return f"{int(seconds // 60)} minutes"
+    if seconds < 86400:
+        return f"{int(seconds // 3600)} hours"
+    return f"{int(seconds // 86400)} days"
+
+def stale_notice(upstream_name, age):
+    """Return a notice to prefix tool results served from a cache entry of the given age."""
+    if age is None:
+        return ""
+    return f"Note: showing cached data from {format_age(age)} ago; {upstream_name} is being refreshed or is unavailable.\n\n"
@@ -0,0 +1,136 @@
+"""
+Serving helpers shared by the MCP servers in this repository.
+
+Covers running blocking tools off the event loop and serving a server over the stdio,
+SSE or streamable HTTP transport, the latter optionally across several worker processes.
+"""
+import argparse
+import functools
+import logging
+import os
+import shutil
+import tempfile
+
+import anyio
+import uvicorn
+from mcp.server.transport_security import TransportSecuritySettings
+
+from mcp_common import resilience
+
+logger = logging.getLogger("mcp_common")
+
+def threaded_tool(mcp):
+    """
+    Register a tool whose body blocks on the network or the state database.
+
+    FastMCP calls synchronous tools directly on the event loop, so one slow upstream
+    call would stall every other request handled by the process. The registered tool
+    instead runs the function on a worker thread; the module-level name stays the plain
+    synchronous function.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def run_in_thread(*args, **kwargs):
+            return await anyio.to_thread.run_sync(functools.partial(fn, *args, **kwargs))
+        mcp.tool()(run_in_thread)
+        return fn
+    return decorator
+
+def parse_allowed_hosts(value):
+    """Split a comma-separated list of host names."""
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+def configure_transport_security(mcp, bind_host, allowed_hosts):
+    """
+    Restrict the Host and Origin headers accepted over HTTP, to protect against DNS rebinding.
+
+    Localhost is always accepted, along with the bind address unless it is a wildcard
+    address, and any host names in allowed_hosts (optionally with a port).
+    """
+    names = ["127.0.0.1", "localhost", "[::1]"]
+    if bind_host not in ("0.0.0.0", "::", ""):
+        names.append(f"[{bind_host}]" if ":" in bind_host else bind_host)
+    names += allowed_hosts
+
+    hosts, origins = [], []
+    for name in names:
+        hosts += [name, f"{name}:*"]
+        origins += [f"{scheme}://{name}{port}" for scheme in ("http", "https") for port in ("", ":*")]
+
+    mcp.settings.transport_security = TransportSecuritySettings(
+        enable_dns_rebinding_protection=True,
+        allowed_hosts=hosts,
+        allowed_origins=origins,
+    )
+
+def create_app(mcp):
+    """Build the streamable HTTP app run by each worker process in HTTP mode."""
+    # Stateless JSON responses let any worker answer any request, so workers
+    # share nothing but the state database
+    mcp.settings.stateless_http = True
+    mcp.settings.json_response = True
+    # Workers only see the environment, which serve() fills in from the command line
+    configure_transport_security(mcp, os.getenv("MCP_HTTP_HOST", "127.0.0.1"), parse_allowed_hosts(os.getenv("MCP_ALLOWED_HOSTS", "")))
+    return mcp.streamable_http_app()
+
+def serve(mcp, server_dir, transport, host, port, workers, drain_seconds, allowed_hosts):
+    """
+    Serve the tools over HTTP, optionally across several worker processes.
+
+    Worker processes import the app from the server.py module in server_dir, which must
+    define a create_app() factory. On SIGINT or SIGTERM the server stops accepting
+    connections and gives in-flight requests up to drain_seconds to finish before
+    exiting. Requests are only accepted with a localhost or bind-address Host header,
+    or one listed in allowed_hosts.
+    """
+    if transport == "sse" and workers > 1:
+        raise SystemExit("The SSE transport keeps sessions in worker memory; use --transport streamable-http for multiple workers.")
+
+    state_dir = None
+    if workers > 1 and resilience.STATE_DB == ":memory:":
+        # Give this run a private database, which workers find through the environment
+        # they inherit; it is removed again on shutdown
+        state_dir = tempfile.mkdtemp(prefix=f"{os.path.basename(server_dir)}_state_")
+        os.environ["STATE_DB"] = os.path.join(state_dir, "state.sqlite3")
+        logger.info(f"Sharing state between workers through {os.environ['STATE_DB']}")
+    if host in ("0.0.0.0", "::") and not allowed_hosts:
+        logger.warning("Only localhost Host headers will be accepted; pass --allowed-hosts with the names clients use to reach this server.")
+    os.environ["MCP_HTTP_HOST"] = host
+    os.environ["MCP_ALLOWED_HOSTS"] = ",".join(allowed_hosts)
+
+    if transport == "sse":
+        configure_transport_security(mcp, host, allowed_hosts)
+        app, factory = mcp.sse_app(), False
+    else:
+        app, factory = "server:create_app", True
+
+    try:
+        uvicorn.run(
+            app,
+            factory=factory,
+            app_dir=server_dir,
+            host=host,
+            port=port,
+            workers=workers,
+            timeout_graceful_shutdown=drain_seconds,
+        )
+    finally:
+        if state_dir is not None:
+            shutil.rmtree(state_dir, ignore_errors=True)
+
+def run(mcp, server_file):
+    """Run a server from the command line, over stdio unless an HTTP transport is requested."""
+    parser = argparse.ArgumentParser(description=f"Run the {mcp.name} MCP server.")
+    parser.add_argument("--transport", choices=["stdio", "sse", "streamable-http"], default="stdio", help="Transport to serve (default: stdio)")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind in HTTP modes")
+    parser.add_argument("--port", type=int, default=8000, help="Port to bind in HTTP modes")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for streamable-http")
+    parser.add_argument("--drain-seconds", type=float, default=30, help="Time allowed for in-flight requests on shutdown")
+    parser.add_argument("--allowed-hosts", default=os.getenv("MCP_ALLOWED_HOSTS", ""), help="Comma-separated host names clients may use in HTTP modes, besides localhost and the bind address")
+    args = parser.parse_args()
+
+    if args.transport == "stdio":
+        mcp.run()
+    else:
+        server_dir = os.path.dirname(os.path.abspath(server_file))
+        serve(mcp, server_dir, args.transport, args.host, args.port, args.workers, args.drain_seconds, parse_allowed_hosts(args.allowed_hosts))
@@ -0,0 +1,183 @@
+"""Tests for the response cache, offline fallback and circuit breaker, against a stub upstream."""
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from mcp_common import resilience
+
+URL = "https://api.example.test/v1/things"
+
+def get(query="stub", **params):
+    return resilience.cached_get(URL, None, dict(params, q=query))
+
+class LockedStateStore(resilience.StateStore):
+    """A state store whose database stays locked, as under heavy multi-worker contention."""
+
+    def connection(self):
+        raise sqlite3.OperationalError("database is locked")
+
+class FailingCommitStateStore(resilience.StateStore):
+    """A state store whose COMMITs fail while fail_commit is set, as when another process holds the database."""
+
+    fail_commit = True
+
+    def connection(self):
+        store, conn = self, super().connection()
+
+        class FailingCommitConnection:
+            in_transaction = property(lambda _: conn.in_transaction)
+
+            def execute(self, sql, params=()):
+                if sql == "COMMIT" and store.fail_commit:
+                    raise sqlite3.OperationalError("database is locked")
+                return conn.execute(sql, params)
+
+        return FailingCommitConnection()
+
+class PerThreadStateStore:
+    """Gives each thread its own StateStore on one database file, as separate worker processes have."""
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+
+    def __getattr__(self, name):
+        if not hasattr(self.local, "store"):
+            self.local.store = resilience.StateStore(self.path)
+        return getattr(self.local.store, name)
+
+def test_fresh_cache_hit(upstream):
+    assert get() == (upstream.payload, None)
+    assert get() == (upstream.payload, None)
+    assert upstream.calls == 1
+
+def test_stale_hit_triggers_one_background_refresh(upstream, monkeypatch):
+    monkeypatch.setattr(resilience, "CACHE_FRESH_SECONDS", 0)
+    get()
+    upstream.delay = 0.2
+    results = [get() for _ in range(3)]
+    upstream.wait_for_background_refreshes()
+    # The stale entry is served straight away, and only one refresh reaches the upstream
+    assert all(data == upstream.payload and age is not None for data, age in results)
+    assert upstream.calls == 2
+
+def test_concurrent_misses_make_one_upstream_call(upstream):
+    upstream.delay = 0.2
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: get(), range(8)))
+    assert upstream.calls == 1
+    assert results == [(upstream.payload, None)] * 8
+
+def test_concurrent_misses_across_workers_make_one_upstream_call(upstream, monkeypatch, tmp_path):
+    path = str(tmp_path / "state.sqlite3")
+    # Create the tables up front, and give writers time to queue rather than skip the state
+    resilience.StateStore(path).connection()
+    monkeypatch.setattr(resilience, "STATE_BUSY_TIMEOUT", 5)
+    monkeypatch.setattr(resilience, "state", PerThreadStateStore(path))
+    upstream.delay = 0.2
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(lambda _: get(), range(4)))
+    assert upstream.calls == 1
+    assert results == [(upstream.payload, None)] * 4
+
+def test_falls_back_to_cache_when_upstream_fails(upstream, monkeypatch):
+    monkeypatch.setattr(resilience, "CACHE_FRESH_SECONDS", 0)
+    monkeypatch.setattr(resilience, "CACHE_MAX_STALE_SECONDS", 0)
+    get()
+    upstream.down = True
+    data, age = get()
+    assert upstream.calls == 2
+    assert data == upstream.payload
+    assert age is not None
+
+def test_client_errors_are_not_served_from_cache(upstream, monkeypatch):
+    monkeypatch.setattr(resilience, "CACHE_FRESH_SECONDS", 0)
+    monkeypatch.setattr(resilience, "CACHE_MAX_STALE_SECONDS", 0)
+    get()
+    upstream.status_code = 404
+    with pytest.raises(requests.exceptions.HTTPError):
+        get()
+
+def test_secret_params_are_left_out_of_the_cache_key(upstream):
+    assert resilience.cached_get(URL, None, {"q": "stub", "key": "first-secret"}, secret_params=("key",))[1] is None
+    assert resilience.cached_get(URL, None, {"q": "stub", "key": "second-secret"}, secret_params=("key",))[1] is None
+    assert upstream.calls == 1
+    assert "secret" not in str(resilience.state.execute("SELECT key FROM cache"))
+
+def test_breaker_opens_and_half_opens(upstream, monkeypatch):
+    monkeypatch.setattr(resilience, "BREAKER_FAILURE_THRESHOLD", 3)
+    monkeypatch.setattr(resilience, "BREAKER_RESET_SECONDS", 0.2)
+    upstream.down = True
+    for i in range(3):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            get(f"query {i}")
+    assert upstream.calls == 3
+
+    # Open: fail fast without calling the upstream
+    with pytest.raises(resilience.CircuitOpenError):
+        get("other")
+    assert upstream.calls == 3
+
+    # Half-open: one trial goes through, and its failure reopens the circuit
+    time.sleep(0.25)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        get("other")
+    assert upstream.calls == 4
+    with pytest.raises(resilience.CircuitOpenError):
+        get("other")
+    assert upstream.calls == 4
+
+    # A successful trial closes the circuit again
+    time.sleep(0.25)
+    upstream.down = False
+    get("other")
+    get("another")
+    assert upstream.calls == 6
+
+def test_rate_limited_trial_leaves_the_circuit_half_open(upstream, monkeypatch):
+    monkeypatch.setattr(resilience, "BREAKER_FAILURE_THRESHOLD", 1)
+    monkeypatch.setattr(resilience, "BREAKER_RESET_SECONDS", 0.2)
+    upstream.down = True
+    with pytest.raises(requests.exceptions.ConnectionError):
+        get()
+    time.sleep(0.25)
+
+    # The trial is turned away by the rate limit before reaching the upstream
+    monkeypatch.setattr(resilience, "UPSTREAM_RATE_LIMIT_PER_MINUTE", 1)
+    resilience.state.take_rate_limit("api.example.test")
+    with pytest.raises(resilience.RateLimitedError):
+        get()
+    assert upstream.calls == 1
+
+    # The next caller gets to make the trial instead of waiting for it to time out
+    monkeypatch.setattr(resilience, "UPSTREAM_RATE_LIMIT_PER_MINUTE", 0)
+    upstream.down = False
+    get()
+    assert upstream.calls == 2
+
+def test_calls_upstream_directly_when_state_is_locked(upstream, monkeypatch):
+    monkeypatch.setattr(resilience, "state", LockedStateStore(":memory:"))
+    assert get() == (upstream.payload, None)
+    assert upstream.calls == 1
+    upstream.down = True
+    with pytest.raises(requests.exceptions.ConnectionError):
+        get()
+
+def test_stale_notice():
+    assert resilience.stale_notice("Example API", None) == ""
+    assert resilience.stale_notice("Example API", 7200).startswith("Note: showing cached data from 2 hours ago; Example API")
+
+def test_failed_commit_is_rolled_back():
+    store = FailingCommitStateStore(":memory:")
+    with pytest.raises(sqlite3.OperationalError):
+        store.put_cached("key", {"data": 1})
+    assert store.get_cached("key") is None
+
+    # The connection is usable again for later transactions
+    store.fail_commit = False
+    store.put_cached("key", {"data": 2})
+    assert store.get_cached("key")[0] == {"data": 2}
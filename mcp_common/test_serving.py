@@ -0,0 +1,64 @@
+"""Tests for the HTTP serving helpers."""
+import pytest
+from mcp.server.fastmcp import FastMCP
+from starlette.testclient import TestClient
+
+from mcp_common import serving
+
+MCP_HEADERS = {"Accept": "application/json, text/event-stream", "Content-Type": "application/json"}
+
+def allowed_hosts(bind_host, extra_hosts=()):
+    mcp = FastMCP("test")
+    serving.configure_transport_security(mcp, bind_host, list(extra_hosts))
+    return mcp.settings.transport_security
+
+def test_wildcard_bind_only_allows_localhost():
+    security = allowed_hosts("0.0.0.0")
+    assert security.enable_dns_rebinding_protection
+    assert set(security.allowed_hosts) == {"127.0.0.1", "127.0.0.1:*", "localhost", "localhost:*", "[::1]", "[::1]:*"}
+    assert "http://localhost:*" in security.allowed_origins
+
+def test_explicit_bind_address_is_allowed():
+    security = allowed_hosts("10.0.0.5")
+    assert {"10.0.0.5", "10.0.0.5:*"} <= set(security.allowed_hosts)
+    assert {"http://10.0.0.5:*", "https://10.0.0.5"} <= set(security.allowed_origins)
+    assert "[fe80::1]:*" in allowed_hosts("fe80::1").allowed_hosts
+
+def test_allowed_hosts_are_added():
+    security = allowed_hosts("0.0.0.0", serving.parse_allowed_hosts(" mcp.example.test, ,10.0.0.6:8000"))
+    assert {"mcp.example.test", "mcp.example.test:*", "10.0.0.6:8000"} <= set(security.allowed_hosts)
+    assert "https://mcp.example.test" in security.allowed_origins
+    assert "0.0.0.0" not in security.allowed_hosts
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.delenv("MCP_HTTP_HOST", raising=False)
+    monkeypatch.delenv("MCP_ALLOWED_HOSTS", raising=False)
+    mcp = FastMCP("test")
+
+    @serving.threaded_tool(mcp)
+    def add(a: int, b: int) -> str:
+        """Add two numbers."""
+        return str(a + b)
+
+    # The context manager runs the app's lifespan, which starts the session manager
+    with TestClient(serving.create_app(mcp), base_url="http://localhost") as client:
+        yield client
+
+def call_add(client, headers=MCP_HEADERS):
+    return client.post(
+        "/mcp",
+        headers=headers,
+        json={"jsonrpc": "2.0", "id": 1, "method": "tools/call", "params": {"name": "add", "arguments": {"a": 2, "b": 3}}},
+    )
+
+def test_stateless_app_answers_tool_call(client):
+    # No initialize request or session ID first: any worker can answer any request
+    response = call_add(client)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/json")
+    assert response.json()["result"]["content"][0]["text"] == "5"
+
+def test_stateless_app_rejects_unknown_host(client):
+    response = call_add(client, headers=dict(MCP_HEADERS, Host="evil.test"))
+    assert response.status_code == 421
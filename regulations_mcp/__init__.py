@@ -0,0 +1 @@
+"""MCP server for the regulations.gov API."""
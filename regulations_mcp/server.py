@@ -4,8 +4,15 @@ import os
 import logging
 from dotenv import load_dotenv
 import json
+import sys
 from datetime import datetime, timedelta
 
+# The code shared by both servers lives in mcp_common at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mcp_common import serving
+from mcp_common.resilience import cached_get, fetch_json, stale_notice
+from mcp_common.serving import threaded_tool
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("regulations_mcp")
@@ -25,12 +32,19 @@ if not API_KEY:
     logger.warning("WARNING: REGULATIONS_GOV_API_KEY is not set. Using demo mode with limited functionality.")
     API_KEY = "DEMO_KEY"  # Use a demo key that will work for some basic endpoints
 
-# Base URL for regulations.gov API
-BASE_URL = "https://api.regulations.gov/v4"
+# Base URL for regulations.gov API (can be overridden, e.g. to point at a local stub)
+BASE_URL = os.getenv("REGULATIONS_GOV_BASE_URL", "https://api.regulations.gov/v4")
 
 # Create an MCP server
 mcp = FastMCP("Regulations.gov Service")
 
+def add_stale_notice(formatted_result, *results):
+    """Prefix a tool result with a notice when any of its API results came from a stale cache entry."""
+    ages = [result["_cache_age"] for result in results if result.get("_cache_age") is not None]
+    if not ages:
+        return formatted_result
+    return stale_notice("regulations.gov", max(ages)) + formatted_result
+
 def make_api_request(endpoint, method="GET", params=None, data=None):
     """Make a request to the regulations.gov API."""
     if params is None:
@@ -46,20 +60,18 @@ def make_api_request(endpoint, method="GET", params=None, data=None):
     
     try:
         if method == "GET":
-            response = requests.get(url, headers=headers, params=params)
-        elif method == "POST":
-            response = requests.post(url, headers=headers, params=params, json=data)
-        else:
-            raise ValueError(f"Unsupported HTTP method: {method}")
-        
-        response.raise_for_status()
-        return response.json()
+            result, age = cached_get(url, headers, params)
+            if age is not None:
+                # Copy so the notice marker never ends up in the cache itself
+                result = dict(result, _cache_age=age)
+            return result
+        return fetch_json(method, url, headers, params, data)
     
     except requests.exceptions.RequestException as e:
         logger.error(f"API request error: {str(e)}")
         
         # Provide more helpful error messages for common issues
-        if API_KEY == "DEMO_KEY" and hasattr(e, 'response') and e.response.status_code in [403, 429]:
+        if API_KEY == "DEMO_KEY" and getattr(e, 'response', None) is not None and e.response.status_code in [403, 429]:
             logger.error("Demo key has limited access. Please set a valid REGULATIONS_GOV_API_KEY environment variable.")
         
         # Return a structured error response
@@ -74,7 +86,7 @@ def make_api_request(endpoint, method="GET", params=None, data=None):
         
         return {"error": error_message}
 
-@mcp.tool()
+@threaded_tool(mcp)
 def search_documents(search_term: str = "", sort: str = "postedDate", posted_date_from: str = "", posted_date_to: str = "", document_type: str = "", docket_id: str = "", agency: str = "", limit: int = 10) -> str:
     """
     Search for documents in regulations.gov.
@@ -155,9 +167,9 @@ def search_documents(search_term: str = "", sort: str = "postedDate", posted_dat
         formatted_result += f"Docket ID: {attributes.get('docketId', 'No docket ID')}\n"
         formatted_result += "\n"
     
-    return formatted_result
+    return add_stale_notice(formatted_result, result)
 
-@mcp.tool()
+@threaded_tool(mcp)
 def search_comments(search_term: str = "", sort: str = "postedDate", posted_date_from: str = "", posted_date_to: str = "", docket_id: str = "", agency: str = "", limit: int = 10) -> str:
     """
     Search for comments in regulations.gov.
@@ -236,9 +248,9 @@ def search_comments(search_term: str = "", sort: str = "postedDate", posted_date
         
         formatted_result += "\n"
     
-    return formatted_result
+    return add_stale_notice(formatted_result, result)
 
-@mcp.tool()
+@threaded_tool(mcp)
 def search_dockets(search_term: str = "", sort: str = "title", agency: str = "", limit: int = 10) -> str:
     """
     Search for dockets in regulations.gov.
@@ -295,9 +307,9 @@ def search_dockets(search_term: str = "", sort: str = "title", agency: str = "",
         
         formatted_result += "\n"
     
-    return formatted_result
+    return add_stale_notice(formatted_result, result)
 
-@mcp.tool()
+@threaded_tool(mcp)
 def get_document_details(document_id: str) -> str:
     """
     Get detailed information about a specific document.
@@ -343,9 +355,9 @@ def get_document_details(document_id: str) -> str:
             summary = summary[:500] + "..."
         formatted_result += f"\nSummary: {summary}\n"
     
-    return formatted_result
+    return add_stale_notice(formatted_result, result)
 
-@mcp.tool()
+@threaded_tool(mcp)
 def get_comment_details(comment_id: str) -> str:
     """
     Get detailed information about a specific comment.
@@ -380,9 +392,9 @@ def get_comment_details(comment_id: str) -> str:
     if "comment" in attributes:
         formatted_result += f"\nComment Text:\n{attributes.get('comment', 'No comment text')}\n"
     
-    return formatted_result
+    return add_stale_notice(formatted_result, result)
 
-@mcp.tool()
+@threaded_tool(mcp)
 def get_docket_details(docket_id: str) -> str:
     """
     Get detailed information about a specific docket.
@@ -435,7 +447,7 @@ def get_docket_details(docket_id: str) -> str:
                 doc_attrs = doc.get("attributes", {})
                 formatted_result += f"- {doc_attrs.get('title', 'No title')} ({doc.get('id', 'No ID')})\n"
     
-    return formatted_result
+    return add_stale_notice(formatted_result, result, doc_result)
 
 @mcp.tool()
 def list_agencies() -> str:
@@ -505,6 +517,10 @@ def get_regulations_info() -> str:
     - Get details about a docket of interest
     """
 
+def create_app():
+    """Build the streamable HTTP app run by each worker process in HTTP mode."""
+    return serving.create_app(mcp)
+
 if __name__ == "__main__":
-    # Run the server
-    mcp.run()
+    # Run the server (stdio by default; see --help for the HTTP modes)
+    serving.run(mcp, __file__)
@@ -0,0 +1,26 @@
+"""Tests for the stale-data notices in the regulations.gov tools, against a stub upstream."""
+from mcp_common import resilience
+from regulations_mcp import server
+
+DOCUMENT = {"id": "EPA-HQ-OAR-2024-0001-0001", "attributes": {"title": "Stub document", "docketId": "EPA-HQ-OAR-2024-0001"}}
+
+def regulations_payload(url):
+    return {"data": [DOCUMENT]} if url.endswith("/documents") else {"data": DOCUMENT}
+
+def test_stale_document_details_carry_a_notice(upstream, monkeypatch):
+    upstream.payload = regulations_payload
+    fresh = server.get_document_details("EPA-HQ-OAR-2024-0001-0001")
+    assert not fresh.startswith("Note:")
+    monkeypatch.setattr(resilience, "CACHE_FRESH_SECONDS", 0)
+    stale = server.get_document_details("EPA-HQ-OAR-2024-0001-0001")
+    assert stale.startswith("Note: showing cached data from")
+    assert "regulations.gov is being refreshed or is unavailable" in stale
+    assert stale.endswith(fresh)
+
+def test_docket_details_notice_uses_the_older_age(upstream):
+    upstream.payload = regulations_payload
+    server.get_docket_details("EPA-HQ-OAR-2024-0001")
+    # Only the docket's document list is stale
+    resilience.state.execute("UPDATE cache SET stored_at = stored_at - 600 WHERE key LIKE '%/documents?%'")
+    result = server.get_docket_details("EPA-HQ-OAR-2024-0001")
+    assert result.startswith("Note: showing cached data from 10 minutes ago")
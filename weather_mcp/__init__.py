@@ -0,0 +1 @@
+"""MCP server for the WeatherAPI.com API."""
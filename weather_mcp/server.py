@@ -1,8 +1,20 @@
 from mcp.server.fastmcp import FastMCP
 import requests
 import os
+import logging
 from dotenv import load_dotenv
 import json
+import sys
+
+# The code shared by both servers lives in mcp_common at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mcp_common import serving
+from mcp_common.resilience import cached_get, stale_notice
+from mcp_common.serving import threaded_tool
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("weather_mcp")
 
 # Load environment variables
 load_dotenv()
@@ -10,10 +22,13 @@ load_dotenv()
 # Get API key from environment variables (optional, we'll use a free API if not available)
 WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
 
+# Base URL for WeatherAPI.com (can be overridden, e.g. to point at a local stub)
+WEATHER_API_BASE_URL = os.getenv("WEATHER_API_BASE_URL", "https://api.weatherapi.com/v1")
+
 # Create an MCP server
 mcp = FastMCP("Weather Service")
 
-@mcp.tool()
+@threaded_tool(mcp)
 def get_forecast(location: str, days: int = 1) -> str:
     """
     Get the weather forecast for a location.
@@ -30,7 +45,7 @@ def get_forecast(location: str, days: int = 1) -> str:
         return "Please provide a number of days between 1 and 3."
     
     # Use WeatherAPI.com (they have a free tier)
-    url = "https://api.weatherapi.com/v1/forecast.json"
+    url = f"{WEATHER_API_BASE_URL}/forecast.json"
     
     params = {
         "key": WEATHER_API_KEY or "YOUR_API_KEY",  # Replace with your API key if not using env var
@@ -41,12 +56,11 @@ def get_forecast(location: str, days: int = 1) -> str:
     }
     
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()  # Raise an exception for 4XX/5XX responses
-        data = response.json()
+        data, age = cached_get(url, None, params, secret_params=("key",))
         
         # Format the response
-        result = f"Weather forecast for {data['location']['name']}, {data['location']['country']}:\n\n"
+        result = stale_notice("WeatherAPI.com", age)
+        result += f"Weather forecast for {data['location']['name']}, {data['location']['country']}:\n\n"
         
         for day in data['forecast']['forecastday']:
             date = day['date']
@@ -65,7 +79,7 @@ def get_forecast(location: str, days: int = 1) -> str:
     except requests.exceptions.RequestException as e:
         return f"Error fetching weather data: {str(e)}"
 
-@mcp.tool()
+@threaded_tool(mcp)
 def get_alerts(location: str) -> str:
     """
     Get severe weather alerts for a location.
@@ -77,7 +91,7 @@ def get_alerts(location: str) -> str:
         A string containing any active weather alerts
     """
     # Use WeatherAPI.com (they have a free tier)
-    url = "https://api.weatherapi.com/v1/forecast.json"
+    url = f"{WEATHER_API_BASE_URL}/forecast.json"
     
     params = {
         "key": WEATHER_API_KEY or "YOUR_API_KEY",  # Replace with your API key if not using env var
@@ -88,16 +102,15 @@ def get_alerts(location: str) -> str:
     }
     
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()  # Raise an exception for 4XX/5XX responses
-        data = response.json()
+        data, age = cached_get(url, None, params, secret_params=("key",))
         
         # Format the response
         location_name = f"{data['location']['name']}, {data['location']['country']}"
         
         if 'alerts' in data and 'alert' in data['alerts'] and data['alerts']['alert']:
             alerts = data['alerts']['alert']
-            result = f"Weather alerts for {location_name}:\n\n"
+            result = stale_notice("WeatherAPI.com", age)
+            result += f"Weather alerts for {location_name}:\n\n"
             
             for alert in alerts:
                 result += f"Alert: {alert.get('headline', 'Unknown alert')}\n"
@@ -107,7 +120,7 @@ def get_alerts(location: str) -> str:
             
             return result
         else:
-            return f"No weather alerts currently active for {location_name}."
+            return stale_notice("WeatherAPI.com", age) + f"No weather alerts currently active for {location_name}."
     
     except requests.exceptions.RequestException as e:
         return f"Error fetching weather alerts: {str(e)}"
@@ -130,6 +143,10 @@ def get_weather_info() -> str:
     - Check for any severe weather alerts in Miami
     """
 
+def create_app():
+    """Build the streamable HTTP app run by each worker process in HTTP mode."""
+    return serving.create_app(mcp)
+
 if __name__ == "__main__":
-    # Run the server
-    mcp.run()
+    # Run the server (stdio by default; see --help for the HTTP modes)
+    serving.run(mcp, __file__)
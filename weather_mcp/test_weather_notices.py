@@ -0,0 +1,30 @@
+"""Tests for the stale-data notices in the weather tools, against a stub upstream."""
+from mcp_common import resilience
+from weather_mcp import server
+
+FORECAST = {
+    "location": {"name": "Stubville", "country": "Nowhere"},
+    "forecast": {"forecastday": [{"date": "2024-01-01", "day": {"condition": {"text": "Sunny"}, "maxtemp_c": 20.0, "mintemp_c": 10.0, "maxtemp_f": 68.0, "mintemp_f": 50.0}}]},
+}
+
+def test_stale_forecast_carries_a_notice(upstream, monkeypatch):
+    upstream.payload = FORECAST
+    fresh = server.get_forecast("Stubville")
+    assert not fresh.startswith("Note:")
+    monkeypatch.setattr(resilience, "CACHE_FRESH_SECONDS", 0)
+    stale = server.get_forecast("Stubville")
+    assert stale.startswith("Note: showing cached data from")
+    assert "WeatherAPI.com is being refreshed or is unavailable" in stale
+    assert stale.endswith(fresh)
+
+def test_stale_alerts_carry_a_notice(upstream, monkeypatch):
+    upstream.payload = dict(FORECAST, alerts={"alert": []})
+    server.get_alerts("Stubville")
+    monkeypatch.setattr(resilience, "CACHE_FRESH_SECONDS", 0)
+    assert server.get_alerts("Stubville").startswith("Note: showing cached data from")
+
+def test_api_key_is_not_stored_in_the_cache(upstream, monkeypatch):
+    upstream.payload = FORECAST
+    monkeypatch.setattr(server, "WEATHER_API_KEY", "stub-secret-key")
+    server.get_forecast("Stubville")
+    assert "stub-secret-key" not in str(resilience.state.execute("SELECT key FROM cache"))